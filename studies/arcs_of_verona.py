@@ -16,33 +16,41 @@ from utils.colors import (
 from utils.transform import (
     polar2vec, perspective, perspective_point, translate,
 )
-from utils.primitives import draw_path, draw_poly, rectangle
+from utils.primitives import (
+    draw_path, draw_poly, rectangle, user_tolerance, arc_between,
+    simplify_path, path_extents,
+)
+from utils.render import offscreen_like, blit
+from utils.patterns import linear_gradient, radial_gradient
 
 BASE_COLORS = make_palette((0xbfcecd, 0x502920, 0xa7462d, 0xd07347, 0xe7c4a8))
 WIDTH, HEIGHT = 1024, 1024
 
-# set random seed to reproduce the exact result
+# random seed to reproduce the exact result, set on render
 SEED = 18757
-random.seed(SEED)
 
 # common values for perspective
 persp_angle = math.pi / 2 / 1.1
 focal_l = 2.5
+# max deviation of curves from their polylines, in device pixels
+ARC_TOLERANCE = 0.25
 
-# init main canvas
-surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, WIDTH, HEIGHT)
-ctx = cairo.Context(surface)
-# init context for floor (to imitate reflections)
-surface_floor = cairo.ImageSurface(cairo.FORMAT_ARGB32, WIDTH, HEIGHT)
-ctx_floor = cairo.Context(surface_floor)
+# main canvas context, set on render
+ctx = None
 
 
 def generate_arc_paths(x, y, width, height, num_straight,
                        num_round1, num_round2, brick_ratio=0.27):
-    """Generate paths for an arc."""
+    """Generate paths for an arc.
+
+    Besides the outer, inner and depth paths, a path of arc centers is
+    returned, to curve the bricks ending at each point (None if straight).
+
+    """
     path_outer = []
     path_inner = []
     path_depth = []
+    path_center = []
     cam_y = -abs(height * 0.7)
     # straight path
     for i in range(num_straight + 1):
@@ -55,6 +63,7 @@ def generate_arc_paths(x, y, width, height, num_straight,
         xp, yp = perspective_point(xp, yp - cam_y, 0, focal_l * width,
                                    width * brick_ratio * 0.5)
         path_depth.append((-xp + x, -yp + y + cam_y))
+        path_center.append(None)
     # round path with R=width, ~45 degrees
     for i in range(1, num_round1 + 1):
         phi = i / num_round1 * math.pi * 0.29
@@ -67,6 +76,7 @@ def generate_arc_paths(x, y, width, height, num_straight,
         xp, yp = perspective_point(cx, cy + height - cam_y, 0, focal_l * width,
                                    width * brick_ratio * 0.5)
         path_depth.append((-xp + x, -yp + y + cam_y))
+        path_center.append((x, y + height))
     # round path with R=width*2, ~27.5 degrees
     nx, ny = polar2vec(abs(width), phi + math.pi)
     for i in range(1, num_round2 + 1):
@@ -81,8 +91,9 @@ def generate_arc_paths(x, y, width, height, num_straight,
                                    0, focal_l * width,
                                    width * brick_ratio * 0.5)
         path_depth.append((-xp + x, -yp + y + cam_y))
+        path_center.append((nx + x, ny + y + height))
 
-    return path_outer, path_inner, path_depth
+    return path_outer, path_inner, path_depth, path_center
 
 
 def draw_ceiling(color_main, color_dark, paths_l, paths_r,
@@ -97,23 +108,20 @@ def draw_ceiling(color_main, color_dark, paths_l, paths_r,
     path += [path[0] for path in prev_paths_l[::-1]]
     width = paths_l[0][0][0] - paths_r[0][0][0]
     # main gradient
-    pattern = cairo.RadialGradient(paths_r[8][0][0] + width / 2,
-                                   paths_r[8][0][1], width / 4.1,
-                                   paths_r[6][0][0] + width / 2,
-                                   paths_r[6][0][1], width / 1.6)
-    pattern.add_color_stop_rgba(0, *color_dark)
-    pattern.add_color_stop_rgba(0.6, *color_main)
-    pattern.add_color_stop_rgba(1, *color_dark)
+    pattern = radial_gradient(
+        paths_r[8][0][0] + width / 2, paths_r[8][0][1], width / 4.1,
+        paths_r[6][0][0] + width / 2, paths_r[6][0][1], width / 1.6,
+        ((0, color_dark), (0.6, color_main), (1, color_dark)),
+    )
     ctx.set_source(pattern)
     draw_path(ctx, path)
     ctx.fill()
     # shadow gradient
-    pattern = cairo.RadialGradient(paths_r[9][0][0] + width / 2,
-                                   paths_r[9][0][1], width / 8,
-                                   paths_r[9][0][0] + width / 2,
-                                   paths_r[9][0][1], width / 4)
-    pattern.add_color_stop_rgba(0, 0, 0, 0, 0.3)
-    pattern.add_color_stop_rgba(1, 0, 0, 0, 0)
+    pattern = radial_gradient(
+        paths_r[9][0][0] + width / 2, paths_r[9][0][1], width / 8,
+        paths_r[9][0][0] + width / 2, paths_r[9][0][1], width / 4,
+        ((0, (0, 0, 0, 0.3)), (1, (0, 0, 0, 0))),
+    )
     ctx.set_source(pattern)
     draw_path(ctx, path)
     ctx.fill()
@@ -139,10 +147,11 @@ def draw_lamp(x, y, width, height, color_main, color_dark):
     # light
     yl = y + height * 3 / 4
     r = width * 0.8
-    pattern = cairo.RadialGradient(x, yl, 0, x, yl, r)
-    pattern.add_color_stop_rgba(0, *lighten(light_color, 1))
-    pattern.add_color_stop_rgba(0.2, *light_color)
-    pattern.add_color_stop_rgba(1, *opaque(light_color, -1))
+    pattern = radial_gradient(x, yl, 0, x, yl, r, (
+        (0, lighten(light_color, 1)),
+        (0.2, light_color),
+        (1, opaque(light_color, -1)),
+    ))
     ctx.set_source(pattern)
     ctx.rectangle(x - r, yl - r, r * 2, r * 2)
     ctx.fill()
@@ -161,14 +170,15 @@ def draw_lamp(x, y, width, height, color_main, color_dark):
     ctx.arc(x, y + height / 2 + r, r, math.pi, 0)
     ctx.fill()
     # body
-    pattern = cairo.LinearGradient(x - r, y, x + r, y)
-    pattern.add_color_stop_rgba(0.03, *wireframe_color)
-    pattern.add_color_stop_rgba(0.125, *glass_color)
-    pattern.add_color_stop_rgba(0.27, *wireframe_color)
-    pattern.add_color_stop_rgba(0.5, *glass_color)
-    pattern.add_color_stop_rgba(0.73, *wireframe_color)
-    pattern.add_color_stop_rgba(0.855, *glass_color)
-    pattern.add_color_stop_rgba(0.97, *wireframe_color)
+    pattern = linear_gradient(x - r, y, x + r, y, (
+        (0.03, wireframe_color),
+        (0.125, glass_color),
+        (0.27, wireframe_color),
+        (0.5, glass_color),
+        (0.73, wireframe_color),
+        (0.855, glass_color),
+        (0.97, wireframe_color),
+    ))
     ctx.set_source(pattern)
     ctx.rectangle(x - r, y + height / 2 + r, r * 2, height / 2 - r * 2)
     ctx.fill()
@@ -188,6 +198,7 @@ def draw_verona_arc(x, y, width, height, color_main, color_dark,
                     brick_ratio=0.27, brick_depth=0.5,
                     prev_paths=(None, None), prev_colors=(None, None)):
     """Draw a single arc in Verona style."""
+    tolerance = user_tolerance(ctx, ARC_TOLERANCE)
     paths_r = list(zip(*generate_arc_paths(x, y, width / 2, height,
                                            8, 4, 3, brick_ratio)))
     paths_l = list(zip(*generate_arc_paths(x, y, -width / 2, height,
@@ -204,12 +215,17 @@ def draw_verona_arc(x, y, width, height, color_main, color_dark,
     for paths in (paths_r, paths_l):
         # left and right half-arcs
         for i, coords in enumerate(zip(paths[:-2], paths[1:-1])):
-            (((x1o, y1o), (x1i, y1i), (x1d, y1d)),
-             ((x2o, y2o), (x2i, y2i), (x2d, y2d))) = coords
-            coords = [(x1o, y1o), (x2o, y2o), (x2i, y2i),
-                      (x2d, y2d), (x1d, y1d), (x1i, y1i)]
+            (((x1o, y1o), (x1i, y1i), (x1d, y1d), _),
+             ((x2o, y2o), (x2i, y2i), (x2d, y2d), center)) = coords
+            # round bricks are curved, with vertices adapted to screen size
+            coords = [(x1o, y1o)]
+            coords += arc_between((x1o, y1o), (x2o, y2o), center, tolerance)
             if brick_depth == 0:
-                del coords[3:5]
+                coords += [(x2i, y2i)]
+                coords += arc_between((x2i, y2i), (x1i, y1i),
+                                      center, tolerance)
+            else:
+                coords += [(x2i, y2i), (x2d, y2d), (x1d, y1d), (x1i, y1i)]
             grad_ratio = (grad_main[1] - grad_main[0]) * i / (len(paths) - 2) + grad_main[0]
             rand_ratio = random.gauss(grad_ratio, rand_amount)
             blend_ratio = max(0, min(1, (rand_ratio)))
@@ -217,8 +233,10 @@ def draw_verona_arc(x, y, width, height, color_main, color_dark,
             draw_poly(ctx, coords, cur_color, outline_darken=0.29)
             # brick depth
             if brick_depth > 0:
-                coords = ((x1i, y1i), (x2i, y2i),
-                          (x2d, y2d), (x1d, y1d))
+                coords = [(x1i, y1i)]
+                coords += arc_between((x1i, y1i), (x2i, y2i),
+                                      center, tolerance)
+                coords += [(x2d, y2d), (x1d, y1d)]
                 shadow_ratio = (grad_depth[1] - grad_depth[0]) * i / (len(paths) - 2) + grad_depth[0]
                 cur_color = lighten(cur_color, shadow_ratio)
                 draw_poly(ctx, coords, cur_color, outline_darken=0.5)
@@ -256,32 +274,38 @@ def draw_street():
     ctx.set_source_rgba(*color)
     ctx.set_line_width(4)
     num_stripes, num_segments = 3528, 23
+    tolerance = user_tolerance(ctx, ARC_TOLERANCE)
     for i in range(num_stripes):
         dx1 = WIDTH * 0.0042 * (random.random() - 0.5)
         x1, y1 = perspective_point((i / num_stripes - 0.5) * WIDTH + dx1, 0,
                                    persp_angle, focal_l * WIDTH * 0.75)
-        ctx.move_to(x1 + WIDTH / 2, y1 + HEIGHT * 0.93)
+        coords = [(x1, y1)]
         for j in range(num_segments):
             dev = abs(j - num_segments / 3.8) ** 1.42 / num_segments * 1.6
             dx2 = WIDTH * 0.02 * dev * (random.random() - 0.5)
             x2, y2 = perspective_point((i / num_stripes - 0.5) * WIDTH + dx2,
                                        -HEIGHT * 0.5 * j / (num_segments - 1),
                                        persp_angle, focal_l * WIDTH * 0.75)
-            ctx.line_to(x2 + WIDTH / 2, y2 + HEIGHT * 0.93)
+            coords.append((x2, y2))
+        # far segments are getting tiny, drop ones that are not visible
+        coords = simplify_path(coords, tolerance)
+        coords = translate(coords, WIDTH / 2, HEIGHT * 0.93)
+        draw_path(ctx, coords, closed=False)
         ctx.stroke()
 
 
 def draw_floor(x, y, width, length):
     """Draw a floor with ornament."""
-    # change main context to floor
-    global ctx
-    ctx_old = ctx
-    ctx = ctx_floor
-    ctx.set_operator(cairo.Operator.SOURCE)
     # floor plane
     coords = rectangle(-width / 2, 0, width, length)
     coords = perspective(coords, persp_angle, focal_l * width)
     coords = translate(coords, x, y)
+    # change main context to floor (to imitate reflections),
+    # its surface only covers the floor plane
+    global ctx
+    ctx_old = ctx
+    surface_floor, ctx = offscreen_like(ctx, path_extents(coords))
+    ctx.set_operator(cairo.Operator.SOURCE)
     draw_poly(ctx, coords, opaque(BASE_COLORS[0], -0.5))
     # floor tiles pattern
     tiles_x_base, tiles_y = 4, 5
@@ -339,9 +363,7 @@ def draw_floor(x, y, width, length):
     # restore main context
     ctx = ctx_old
     # blit floor over the main surface
-    ctx.set_source_surface(surface_floor)
-    ctx.rectangle(0, 0, WIDTH, HEIGHT)
-    ctx.fill()
+    blit(ctx, surface_floor)
     # street plane
     draw_street()
 
@@ -396,11 +418,12 @@ def draw_altar(x_p, y_p, w_p, h_p):
         ctx.set_line_width(1)
         ctx.stroke()
     # top altar shadow
-    pattern = cairo.RadialGradient(x_p, y_p + h_p, w_p * 0.13,
-                                   x_p, y_p + h_p, w_p / 4)
-    pattern.add_color_stop_rgba(0, 0, 0, 0, 0)
-    pattern.add_color_stop_rgba(1, 0, 0, 0, 0.9)
-    pattern.add_color_stop_rgba(1, 0, 0, 0, 0)
+    pattern = radial_gradient(x_p, y_p + h_p, w_p * 0.13,
+                              x_p, y_p + h_p, w_p / 4, (
+                                  (0, (0, 0, 0, 0)),
+                                  (1, (0, 0, 0, 0.9)),
+                                  (1, (0, 0, 0, 0)),
+                              ))
     ctx.set_source(pattern)
     ctx.rectangle(x_p + w_p / 2, y_p + h_p * 2, -w_p, -h_p)
     ctx.fill()
@@ -427,14 +450,15 @@ def draw_altar(x_p, y_p, w_p, h_p):
     ctx.rectangle(x_p + w_p * br / 2, y_p + h_p - h_p / 2, -w_p * br, -h_p / 8)
     ctx.fill()
     # side altar shadows
-    pattern = cairo.LinearGradient(x_p - w_p * br / 2, y_p,
-                                   x_p + w_p * br / 2, y_p)
-    pattern.add_color_stop_rgba(0, 0, 0, 0, 0)
-    pattern.add_color_stop_rgba(0, 0, 0, 0, 0.7)
-    pattern.add_color_stop_rgba(0.2, 0, 0, 0, 0)
-    pattern.add_color_stop_rgba(0.8, 0, 0, 0, 0)
-    pattern.add_color_stop_rgba(1, 0, 0, 0, 0.7)
-    pattern.add_color_stop_rgba(1, 0, 0, 0, 0)
+    pattern = linear_gradient(x_p - w_p * br / 2, y_p,
+                              x_p + w_p * br / 2, y_p, (
+                                  (0, (0, 0, 0, 0)),
+                                  (0, (0, 0, 0, 0.7)),
+                                  (0.2, (0, 0, 0, 0)),
+                                  (0.8, (0, 0, 0, 0)),
+                                  (1, (0, 0, 0, 0.7)),
+                                  (1, (0, 0, 0, 0)),
+                              ))
     ctx.set_source(pattern)
     ctx.rectangle(x_p + w_p / 2, y_p + h_p * 1.005, -w_p, -h_p * 0.63)
     ctx.fill()
@@ -489,6 +513,16 @@ def draw_study():
     draw_arcade(WIDTH / 2, HEIGHT * 0.95, WIDTH * 0.72, HEIGHT * 0.485)
 
 
-if __name__ == "__main__":
+def render(target_ctx):
+    """Draw the whole study to a given context, e.g. a band of a poster."""
+    global ctx
+    random.seed(SEED)
+    ctx = target_ctx
     draw_study()
-    surface.write_to_png("./assets/pics/study01-arcs_of_verona.png")
+
+
+if __name__ == "__main__":
+    from utils.output import write_image
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, WIDTH, HEIGHT)
+    render(cairo.Context(surface))
+    write_image(surface, "./assets/pics/study01-arcs_of_verona.png")
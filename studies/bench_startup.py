@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Measure startup time of study modules.
+
+Every module is imported in a fresh interpreter several times, and
+the best and median wall times are reported, minus the time of a
+bare interpreter start.
+
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = (
+    "utils.colors",
+    "utils.transform",
+    "utils.primitives",
+    "utils.render",
+    "utils.output",
+    "arcs_of_verona",
+    "sunset_in_the_city",
+)
+NUM_RUNS = 10
+
+
+def time_import(module, num_runs=NUM_RUNS):
+    """Measure wall times of importing a module in a fresh interpreter."""
+    code = "import %s" % module if module else "pass"
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(num_runs):
+        start = time.perf_counter()
+        subprocess.run((sys.executable, "-c", code), cwd=cwd, check=True,
+                       stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    """Print startup timings for all modules."""
+    base = min(time_import(None))
+    print("%-24s %10s %10s" % ("module", "best, ms", "median, ms"))
+    for module in MODULES:
+        try:
+            timings = time_import(module)
+        except subprocess.CalledProcessError:
+            print("%-24s %21s" % (module, "import failed"))
+            continue
+        print("%-24s %10.1f %10.1f" % (
+            module,
+            (min(timings) - base) * 1000,
+            (statistics.median(timings) - base) * 1000,
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Render a study by horizontal bands, with a constant memory footprint.
+
+Usage example, for a poster-size print:
+
+    ./render.py arcs_of_verona poster.png --width 30000
+
+If only one side is given, the other follows the study's aspect ratio.
+If both are given, the study is scaled to cover them and cropped.
+
+A study could be also recorded to a scene file once, then exported
+to vector formats or re-rendered from it without generation:
+
+    ./render.py arcs_of_verona arcs.scene
+    ./render.py arcs.scene arcs.svg
+
+Post-processing filters, like ``--grain`` and ``--grade`` (color
+grading through study's base colors), are applied to every band.
+
+With ``--profile``, a JSON report of peak memory and top allocation
+sites per ``draw_*`` stage is written along with the image.
+
+"""
+import argparse
+import importlib
+import os
+
+from utils.output import write_bands, DEFAULT_COMPRESSION
+from utils.render import render_bands, output_size, DEFAULT_BAND_HEIGHT
+from utils.scene import Scene
+from utils import profiling
+
+SCENE_EXT = ".scene"
+VECTOR_EXTS = (".svg", ".pdf")
+
+
+def positive_int(value):
+    """Convert a command line argument to a positive integer."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("should be positive: %s" % value)
+    return number
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("study", help="study module name, e.g. "
+                        "arcs_of_verona, or a recorded .scene file")
+    parser.add_argument("output", help="output file (.png, .npy, .rgba, "
+                        ".svg, .pdf, .scene)")
+    parser.add_argument("--width", type=positive_int,
+                        help="output width, study's own by default")
+    parser.add_argument("--height", type=positive_int,
+                        help="output height, study's own by default")
+    parser.add_argument("--band-height", type=positive_int,
+                        default=DEFAULT_BAND_HEIGHT,
+                        help="height of a single rendered band")
+    parser.add_argument("--compression", type=int,
+                        default=DEFAULT_COMPRESSION,
+                        help="zlib compression level for PNG, 0-9")
+    parser.add_argument("--grain", type=float, default=0,
+                        help="film grain amount, e.g. 0.02")
+    parser.add_argument("--grade", type=float, default=0,
+                        help="color grading strength, 0-1")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="number of threads for post-processing")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="profile memory, writing JSON report to a file")
+    return parser.parse_args()
+
+
+def main():
+    """Render a study to a file, profiling it if requested."""
+    args = parse_args()
+    if not args.profile:
+        render(args)
+        return
+    study_modules = ()
+    if not args.study.endswith(SCENE_EXT):
+        study_modules = (importlib.import_module(args.study), )
+    profiling.start(study_modules)
+    try:
+        render(args)
+    finally:
+        profiling.write_report(profiling.stop(), args.profile)
+
+
+def make_post(args, palette):
+    """Make post-processing function for bands, if any filter is set."""
+    if not args.grain and not args.grade:
+        return None
+    from utils.filters import surface_pixels, color_grade, grain
+
+    def post(surface, y):
+        with surface_pixels(surface) as pixels:
+            if args.grade and palette:
+                color_grade(pixels, palette, args.grade, args.threads)
+            if args.grain:
+                grain(pixels, args.grain, 0, y, args.threads)
+    return post
+
+
+def render(args):
+    """Render a study to a file.
+
+    The study is generated only once, recording it to a scene, which
+    is then replayed for every band of a raster output.
+
+    """
+    output_ext = os.path.splitext(args.output)[1].lower()
+    if args.study.endswith(SCENE_EXT):
+        scene = Scene.load(args.study)
+        design_size = (scene.width, scene.height)
+        width, height = output_size(design_size, args.width, args.height)
+        palette = None
+    else:
+        study = importlib.import_module(args.study)
+        design_size = (study.WIDTH, study.HEIGHT)
+        width, height = output_size(design_size, args.width, args.height)
+        scale = max(width / design_size[0], height / design_size[1])
+        scene = Scene(*design_size, scale=scale)
+        study.render(scene)
+        palette = study.BASE_COLORS
+    if output_ext == SCENE_EXT:
+        scene.save_to(args.output)
+        return
+    if output_ext in VECTOR_EXTS:
+        scene.export(args.output)
+        return
+    bands = render_bands(scene.replay, width, height, design_size,
+                         args.band_height, make_post(args, palette))
+    write_bands(bands, args.output, width, height, args.compression)
+
+
+if __name__ == "__main__":
+    main()
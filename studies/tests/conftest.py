@@ -0,0 +1,5 @@
+"""Make studies and their utils importable from tests."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
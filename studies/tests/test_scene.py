@@ -0,0 +1,30 @@
+"""Smoke tests of recording studies to scenes and replaying them."""
+import importlib
+
+import pytest
+
+cairo = pytest.importorskip("cairo")
+
+from utils.scene import Scene  # noqa: E402
+
+STUDIES = ("arcs_of_verona", "sunset_in_the_city")
+
+
+@pytest.mark.parametrize("name", STUDIES)
+def test_record_and_replay(name, tmp_path):
+    study = importlib.import_module(name)
+    scene = Scene(study.WIDTH, study.HEIGHT)
+    study.render(scene)
+    assert scene.ops
+
+    filename = str(tmp_path / "study.scene")
+    scene.save_to(filename)
+    loaded = Scene.load(filename)
+    assert loaded.ops == scene.ops
+
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 64, 64)
+    ctx = cairo.Context(surface)
+    ctx.scale(64 / study.WIDTH, 64 / study.HEIGHT)
+    loaded.replay(ctx)
+    surface.flush()
+    assert any(surface.get_data())
@@ -0,0 +1,200 @@
+"""A collection of post-processing filters on NumPy pixel buffers.
+
+Filters work in place on premultiplied ARGB32 pixels, as returned by
+``surface_pixels``. The buffer is always processed by tiles of at
+most ``TILE_PIXELS`` pixels, to keep float temporaries small, and the
+tiles could be spread over a thread pool, since NumPy releases the GIL.
+
+"""
+import contextlib
+import math
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.output import surface_array
+
+# channel indices of native-endian ARGB32 pixels
+if sys.byteorder == "little":
+    RGB, ALPHA = [2, 1, 0], 3
+else:
+    RGB, ALPHA = [1, 2, 3], 0
+
+# max number of pixels in a single tile
+TILE_PIXELS = 1 << 14
+
+# luminance weights for color grading
+LUMA = np.array((0.2126, 0.7152, 0.0722), dtype=np.float32)
+
+
+@contextlib.contextmanager
+def surface_pixels(surface):
+    """Get pixels of ARGB32 surface to modify them in place."""
+    try:
+        yield surface_array(surface)
+    finally:
+        surface.mark_dirty()
+
+
+def _run_tiles(func, length, span, num_threads=1):
+    """Call ``func(start, stop)`` for every tile of a ``length`` range.
+
+    ``span`` is a number of pixels per unit of the range, e.g. image
+    width for a range of rows.
+
+    """
+    tile = max(1, TILE_PIXELS // max(1, span))
+    tiles = [(start, min(start + tile, length))
+             for start in range(0, length, tile)]
+    if num_threads <= 1:
+        for start, stop in tiles:
+            func(start, stop)
+        return
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        futures = [executor.submit(func, *tile) for tile in tiles]
+        for future in futures:
+            future.result()
+
+
+def _store(pixels, values):
+    """Round float values back to pixels, keeping them premultiplied."""
+    values = np.clip(values + 0.5, 0, 255)
+    values[..., RGB] = np.minimum(values[..., RGB], values[..., [ALPHA]])
+    pixels[...] = values
+
+
+def _rows(array, start, stop):
+    """Take rows of array, if it is not broadcast over them."""
+    array = np.asarray(array, dtype=np.float32)
+    return array[start:stop] if array.ndim > 1 and len(array) > 1 else array
+
+
+def linear_ramp(length, start, end, stops):
+    """Sample ``(offset, rgba)`` color stops along pixel centers.
+
+    Offsets are mapped to a pixel range from ``start`` to ``end``,
+    colors are padded beyond it. The result is a straight RGBA array
+    of ``(length, 4)`` floats.
+
+    """
+    positions = (np.arange(length, dtype=np.float32) + 0.5 - start)
+    positions /= (end - start) or 1
+    offsets = [offset for offset, _ in stops]
+    colors = np.asarray([color for _, color in stops], dtype=np.float32)
+    return np.stack([
+        np.interp(positions, offsets, colors[:, i]) for i in range(4)
+    ], axis=-1).astype(np.float32)
+
+
+def over(pixels, colors, alpha=1, num_threads=1):
+    """Composite straight RGBA colors over pixels in place.
+
+    ``colors`` should broadcast to ``(height, width, 4)``, and
+    ``alpha`` mask to ``(height, width)``, both in 0..1 range.
+
+    """
+    def process(start, stop):
+        tile = pixels[start:stop]
+        color = _rows(colors, start, stop)
+        src_alpha = color[..., 3] * _rows(alpha, start, stop)
+        src = np.empty(np.broadcast_shapes(src_alpha.shape + (4, ),
+                                           tile.shape), dtype=np.float32)
+        src[..., RGB] = color[..., :3] * src_alpha[..., None] * 255
+        src[..., ALPHA] = src_alpha * 255
+        _store(tile, src + tile * (1 - src_alpha[..., None]))
+    _run_tiles(process, pixels.shape[0], pixels.shape[1], num_threads)
+
+
+def alpha_mask(pixels, mask, num_threads=1):
+    """Multiply pixels by alpha mask in place, like DEST_IN operator.
+
+    ``mask`` should broadcast to ``(height, width)``, in 0..1 range.
+
+    """
+    def process(start, stop):
+        tile = pixels[start:stop]
+        _store(tile, tile * _rows(mask, start, stop)[..., None])
+    _run_tiles(process, pixels.shape[0], pixels.shape[1], num_threads)
+
+
+def _gaussian_kernel(sigma):
+    """Make normalized 1D Gaussian kernel."""
+    radius = max(1, math.ceil(sigma * 3))
+    kernel = np.exp(-np.arange(-radius, radius + 1) ** 2 / (2 * sigma ** 2))
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def _convolve(data, kernel, axis):
+    """Convolve array with 1D kernel along an axis, padding by edges."""
+    radius = len(kernel) // 2
+    pad = [(0, 0)] * data.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(data.astype(np.float32), pad, mode="edge")
+    result = np.zeros(data.shape, dtype=np.float32)
+    length = data.shape[axis]
+    for i, weight in enumerate(kernel):
+        result += weight * np.take(padded, range(i, i + length), axis=axis)
+    return result
+
+
+def blur(pixels, sigma, num_threads=1):
+    """Blur pixels in place with a separable Gaussian filter."""
+    if sigma <= 0:
+        return
+    kernel = _gaussian_kernel(sigma)
+
+    def process_rows(start, stop):
+        tile = pixels[start:stop]
+        _store(tile, _convolve(tile, kernel, axis=1))
+
+    def process_columns(start, stop):
+        tile = pixels[:, start:stop]
+        _store(tile, _convolve(tile, kernel, axis=0))
+
+    _run_tiles(process_rows, pixels.shape[0], pixels.shape[1], num_threads)
+    _run_tiles(process_columns, pixels.shape[1], pixels.shape[0],
+               num_threads)
+
+
+def color_grade(pixels, palette, strength=1, num_threads=1):
+    """Map pixels luminance to palette colors, sorted from dark to light."""
+    colors = sorted(palette, key=lambda color: LUMA.dot(color[:3]))
+    ramp = np.asarray([color[:3] for color in colors], dtype=np.float32)
+    offsets = np.linspace(0, 1, len(ramp))
+
+    def process(start, stop):
+        tile = pixels[start:stop]
+        values = tile.astype(np.float32)
+        alpha = values[..., [ALPHA]]
+        rgb = values[..., RGB] / np.maximum(alpha, 1)
+        luma = rgb.dot(LUMA)
+        graded = np.stack([
+            np.interp(luma, offsets, ramp[:, i]) for i in range(3)
+        ], axis=-1)
+        rgb += (graded - rgb) * strength
+        values[..., RGB] = rgb * alpha
+        _store(tile, values)
+    _run_tiles(process, pixels.shape[0], pixels.shape[1], num_threads)
+
+
+def grain(pixels, amount, seed=0, y=0, num_threads=1):
+    """Add monochrome film grain in place, ``amount`` is noise deviation.
+
+    Noise of every row is seeded by its absolute position, ``y`` being
+    the first row of ``pixels`` in the whole image, so the grain does
+    not depend on bands or tiles it is processed by.
+
+    """
+    def process(start, stop):
+        tile = pixels[start:stop]
+        noise = np.stack([
+            np.random.default_rng((seed, y + row)).normal(
+                0, amount * 255, tile.shape[1])
+            for row in range(start, stop)
+        ]).astype(np.float32)
+        values = tile.astype(np.float32)
+        alpha = values[..., ALPHA]
+        values[..., RGB] += (noise * alpha / 255)[..., None]
+        _store(tile, values)
+    _run_tiles(process, pixels.shape[0], pixels.shape[1], num_threads)
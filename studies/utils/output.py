@@ -0,0 +1,194 @@
+"""A collection of helpers for writing rendered images."""
+import os
+import sys
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+DEFAULT_COMPRESSION = 6
+
+# number of threads for async writes, read when the pool is created
+ASYNC_WORKERS = 2
+
+# background pool for async writes, created on first use
+_executor = None
+# async writes that are not done yet, or failed and not waited for
+_pending = set()
+
+
+def surface_array(surface):
+    """Get a writable ``(height, width, 4)`` view of ARGB32 surface pixels."""
+    surface.flush()
+    width, height = surface.get_width(), surface.get_height()
+    return np.ndarray((height, surface.get_stride() // 4, 4), np.uint8,
+                      buffer=surface.get_data())[:, :width]
+
+
+def surface_to_rgba(surface):
+    """Convert ARGB32 surface to a straight (non-premultiplied) RGBA array."""
+    return argb_to_rgba(surface_array(surface))
+
+
+def argb_to_rgba(data):
+    """Convert native-endian premultiplied ARGB32 pixels to straight RGBA."""
+    # ARGB32 is stored as native-endian 32-bit words
+    order = [2, 1, 0, 3] if sys.byteorder == "little" else [1, 2, 3, 0]
+    rgba = data[..., order].astype(np.uint16)
+    alpha = rgba[..., 3:]
+    # unpremultiply the same way cairo does, with rounding
+    rgb = (rgba[..., :3] * 255 + alpha // 2) // np.maximum(alpha, 1)
+    rgba[..., :3] = np.where(alpha > 0, np.minimum(rgb, 255), 0)
+    return rgba.astype(np.uint8)
+
+
+def _png_chunk(tag, data):
+    """Pack a single PNG chunk."""
+    chunk = struct.pack(">I", len(data)) + tag + data
+    return chunk + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+
+def _png_header(width, height):
+    """Pack PNG signature and header for 8-bit RGBA image."""
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return PNG_SIGNATURE + _png_chunk(b"IHDR", header)
+
+
+def _png_scanlines(rgba):
+    """Prepare raw PNG scanlines from RGBA array."""
+    height, width, _ = rgba.shape
+    # every scanline is prefixed with filter type 0 (None)
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+    return raw.tobytes()
+
+
+def encode_png(rgba, compression=DEFAULT_COMPRESSION):
+    """Encode RGBA array to PNG bytes with given zlib compression level."""
+    height, width, _ = rgba.shape
+    return b"".join((
+        _png_header(width, height),
+        _png_chunk(b"IDAT", zlib.compress(_png_scanlines(rgba), compression)),
+        _png_chunk(b"IEND", b""),
+    ))
+
+
+def write_rgba(rgba, filename, compression=DEFAULT_COMPRESSION):
+    """Write RGBA array to a file, format is chosen by extension.
+
+    Supported formats are ``.png``, ``.npy`` and raw RGBA bytes
+    (``.rgba`` or ``.raw``).
+
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".png":
+        with open(filename, "wb") as png_file:
+            png_file.write(encode_png(rgba, compression))
+    elif ext == ".npy":
+        np.save(filename, rgba)
+    elif ext in (".rgba", ".raw"):
+        rgba.tofile(filename)
+    else:
+        raise ValueError("Unsupported output format: %s" % ext)
+
+
+def write_image(surface, filename, compression=DEFAULT_COMPRESSION):
+    """Write surface to a file, format is chosen by extension."""
+    write_rgba(surface_to_rgba(surface), filename, compression)
+
+
+def _forget_write(future):
+    """Drop a finished async write, unless it should report an error."""
+    if future.exception() is None:
+        _pending.discard(future)
+
+
+def write_image_async(surface, filename, compression=DEFAULT_COMPRESSION):
+    """Write surface to a file on a background thread.
+
+    Pixels are copied immediately, so the surface could be reused for
+    the next render while the previous one is encoding. The pool is
+    created with ``ASYNC_WORKERS`` threads on first use.
+
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS)
+    rgba = surface_to_rgba(surface)
+    future = _executor.submit(write_rgba, rgba, filename, compression)
+    _pending.add(future)
+    future.add_done_callback(_forget_write)
+    return future
+
+
+def wait_writes():
+    """Block until all async writes are done, re-raise their errors."""
+    # finished writes are discarded from the worker thread, so the set
+    # is iterated by a snapshot
+    for future in list(_pending):
+        _pending.discard(future)
+        future.result()
+
+
+def open_memmap(filename, width, height):
+    """Open a memory-mapped ``.npy`` RGBA buffer for writing."""
+    return np.lib.format.open_memmap(filename, mode="w+", dtype=np.uint8,
+                                     shape=(height, width, 4))
+
+
+def write_bands(bands, filename, width, height,
+                compression=DEFAULT_COMPRESSION):
+    """Stream ``(y, rgba)`` bands to a file, format is chosen by extension.
+
+    PNG is encoded incrementally, ``.npy`` is written through a memory
+    map, raw RGBA bytes are appended as is. Bands are encoded and
+    written on a background thread while the next one is rendering,
+    so at most two bands are kept in memory at a time.
+
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".png":
+        compressor = zlib.compressobj(compression)
+        with open(filename, "wb") as png_file:
+            png_file.write(_png_header(width, height))
+
+            def write_png_band(_, rgba):
+                data = compressor.compress(_png_scanlines(rgba))
+                if data:
+                    png_file.write(_png_chunk(b"IDAT", data))
+            _write_in_background(bands, write_png_band)
+            png_file.write(_png_chunk(b"IDAT", compressor.flush()))
+            png_file.write(_png_chunk(b"IEND", b""))
+    elif ext == ".npy":
+        buffer = open_memmap(filename, width, height)
+
+        def write_npy_band(y, rgba):
+            buffer[y:y + rgba.shape[0]] = rgba
+        _write_in_background(bands, write_npy_band)
+        buffer.flush()
+        del buffer
+    elif ext in (".rgba", ".raw"):
+        with open(filename, "wb") as raw_file:
+            _write_in_background(
+                bands, lambda _, rgba: raw_file.write(rgba.tobytes()))
+    else:
+        raise ValueError("Unsupported output format: %s" % ext)
+
+
+def _write_in_background(bands, write):
+    """Call ``write(y, rgba)`` for bands in order, on a background thread.
+
+    The next band is taken from ``bands`` (i.e. rendered) while the
+    previous one is writing.
+
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = None
+        for y, rgba in bands:
+            if future is not None:
+                future.result()
+            future = executor.submit(write, y, rgba)
+        if future is not None:
+            future.result()
@@ -0,0 +1,59 @@
+"""A factory of gradient patterns, reusing ones already built.
+
+Gradients are cached by their color stops and geometry relative to the
+first point, and placed at every use by a translation-only pattern
+matrix, so no precision is lost on its way to pixman's fixed point.
+A cached gradient is shared and moved on every get, so it should be
+set as a source right away, and not kept across other gets.
+
+"""
+import cairo
+
+# cache is dropped when it grows over this size, e.g. in batch renders
+MAX_CACHED = 1024
+
+_cache = {}
+
+
+def _stops_key(stops):
+    """Convert ``(offset, rgba)`` color stops to a hashable key."""
+    return tuple(
+        (float(offset), ) + tuple(float(c) for c in color)
+        for offset, color in stops
+    )
+
+
+def _placed(key, make_gradient, x, y):
+    """Get a gradient from cache, building it if needed, placed at x, y."""
+    pattern = _cache.get(key)
+    if pattern is None:
+        if len(_cache) >= MAX_CACHED:
+            _cache.clear()
+        pattern = make_gradient()
+        for stop in key[-1]:
+            pattern.add_color_stop_rgba(*stop)
+        _cache[key] = pattern
+    pattern.set_matrix(cairo.Matrix(x0=-x, y0=-y))
+    return pattern
+
+
+def linear_gradient(x0, y0, x1, y1, stops):
+    """Get a linear gradient with ``(offset, rgba)`` color stops."""
+    vector = (float(x1 - x0), float(y1 - y0))
+    key = ("linear", vector, _stops_key(stops))
+    return _placed(key, lambda: cairo.LinearGradient(0, 0, *vector),
+                   x0, y0)
+
+
+def radial_gradient(cx0, cy0, r0, cx1, cy1, r1, stops):
+    """Get a radial gradient with ``(offset, rgba)`` color stops."""
+    # only radius magnitudes matter, so keep them positive
+    circles = (0.0, 0.0, float(abs(r0)),
+               float(cx1 - cx0), float(cy1 - cy0), float(abs(r1)))
+    key = ("radial", circles, _stops_key(stops))
+    return _placed(key, lambda: cairo.RadialGradient(*circles), cx0, cy0)
+
+
+def clear_cache():
+    """Forget all cached gradients."""
+    _cache.clear()
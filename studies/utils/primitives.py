@@ -1,5 +1,5 @@
 """A collection of helpers for drawing primitives."""
-import cairo
+import math
 
 from utils.colors import lighten
 
@@ -15,7 +15,7 @@ def draw_path(ctx, coords, closed=True):
 
 def draw_poly(ctx, coords, color, line_width=1, outline_darken=0):
     """Draw a single brick."""
-    ctx.set_source(cairo.SolidPattern(*color))
+    ctx.set_source_rgba(*color)
     draw_path(ctx, coords)
     ctx.fill()
     if not outline_darken:
@@ -26,6 +26,83 @@ def draw_poly(ctx, coords, color, line_width=1, outline_darken=0):
     ctx.stroke()
 
 
+def path_extents(coords):
+    """Calculate bounding box of a path, as ``(x1, y1, x2, y2)``."""
+    xs, ys = zip(*coords)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
 def rectangle(x, y, w, h):
     """Generate coords for rectangle."""
     return ((x, y), (x + w, y), (x + w, y + h), (x, y + h))
+
+
+def user_tolerance(ctx, tolerance):
+    """Convert a tolerance in device pixels to user space units."""
+    dx, _ = ctx.device_to_user_distance(tolerance, 0)
+    _, dy = ctx.device_to_user_distance(0, tolerance)
+    return min(abs(dx), abs(dy))
+
+
+def arc_segments(radius, angle, tolerance):
+    """Calculate a number of segments to fit an arc within tolerance."""
+    if radius <= tolerance:
+        return 1
+    # max angle of a chord with sagitta equal to tolerance
+    step = 2 * math.acos(1 - tolerance / radius)
+    return max(1, math.ceil(abs(angle) / step))
+
+
+def arc_between(point1, point2, center, tolerance):
+    """Generate arc points from one point to another, excluding the first.
+
+    Radius is interpolated between the points, so they could lie on
+    slightly different circles. Without a center, just the last point
+    is returned.
+
+    """
+    if center is None:
+        return [point2]
+    (x1, y1), (x2, y2), (cx, cy) = point1, point2, center
+    r1, r2 = math.hypot(x1 - cx, y1 - cy), math.hypot(x2 - cx, y2 - cy)
+    phi1 = math.atan2(y1 - cy, x1 - cx)
+    dphi = math.atan2(y2 - cy, x2 - cx) - phi1
+    dphi = (dphi + math.pi) % (2 * math.pi) - math.pi
+    num_segments = arc_segments(max(r1, r2), dphi, tolerance)
+    points = []
+    for i in range(1, num_segments):
+        ratio = i / num_segments
+        r = r1 + (r2 - r1) * ratio
+        phi = phi1 + dphi * ratio
+        points.append((cx + r * math.cos(phi), cy + r * math.sin(phi)))
+    points.append(point2)
+    return points
+
+
+def simplify_path(coords, tolerance):
+    """Simplify a path with Douglas-Peucker algorithm."""
+    coords = list(coords)
+    if len(coords) < 3:
+        return coords
+    keep = [False] * len(coords)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(coords) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = coords[first], coords[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        max_dist, max_i = 0, None
+        for i in range(first + 1, last):
+            x, y = coords[i]
+            if length:
+                dist = abs(dy * (x - x1) - dx * (y - y1)) / length
+            else:
+                dist = math.hypot(x - x1, y - y1)
+            if dist > max_dist:
+                max_dist, max_i = dist, i
+        if max_dist > tolerance:
+            keep[max_i] = True
+            stack.append((first, max_i))
+            stack.append((max_i, last))
+    return [point for point, kept in zip(coords, keep) if kept]
@@ -0,0 +1,220 @@
+"""A memory profiling mode for renders.
+
+While profiling is active, every ``draw_*`` function defined in given
+modules is a stage: its calls, time and peak traced memory are
+accounted, and for shallow stages the top allocation sites are found
+by comparing ``tracemalloc`` snapshots. Cairo surfaces are allocated
+outside of Python heap, so they are accounted explicitly with
+``account_surface`` and ``release_surface``, to find the peak of
+surface bytes alive.
+
+"""
+import fnmatch
+import functools
+import json
+import os
+import re
+import time
+import tracemalloc
+
+STAGE_PREFIX = "draw_"
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_TOP_SITES = 10
+
+# active profile state, None if profiling is off
+_profile = None
+
+
+def _new_stage():
+    """Make empty stage stats."""
+    return {
+        "calls": 0,
+        "time": 0,
+        "peak_bytes": 0,
+        "allocated_bytes": 0,
+        "sites": {},
+    }
+
+
+def _make_filters():
+    """Make snapshot filters to exclude profiler internals.
+
+    Filters match filenames with ``fnmatch``, compiling regexes on
+    first use, so they are matched once before tracing starts, and
+    ``fnmatch`` and ``re`` modules are excluded too.
+
+    """
+    filters = tuple(
+        tracemalloc.Filter(False, pattern) for pattern in (
+            tracemalloc.__file__,
+            __file__,
+            fnmatch.__file__,
+            os.path.join(os.path.dirname(re.__file__), "*"),
+        )
+    )
+    for snapshot_filter in filters:
+        fnmatch.fnmatch("", snapshot_filter.filename_pattern)
+    return filters
+
+
+def _take_snapshot():
+    """Take tracemalloc snapshot, without profiler internals."""
+    return tracemalloc.take_snapshot().filter_traces(_profile["filters"])
+
+
+def _reset_peak():
+    """Reset traced memory peak, keeping the peak of the whole run."""
+    _, peak = tracemalloc.get_traced_memory()
+    _profile["peak"] = max(_profile["peak"], peak)
+    tracemalloc.reset_peak()
+
+
+def _enter(name):
+    """Start a stage frame."""
+    stack = _profile["stack"]
+    current, peak = tracemalloc.get_traced_memory()
+    if stack:
+        stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+    _reset_peak()
+    snapshot = None
+    if len(stack) < _profile["max_depth"]:
+        snapshot = _take_snapshot()
+    stack.append({
+        "name": name,
+        "start": current,
+        "peak": current,
+        "time": time.perf_counter(),
+        "snapshot": snapshot,
+    })
+
+
+def _exit():
+    """Finish the current stage frame and account it."""
+    stack = _profile["stack"]
+    current, peak = tracemalloc.get_traced_memory()
+    frame = stack.pop()
+    frame["peak"] = max(frame["peak"], peak)
+    stage = _profile["stages"].setdefault(frame["name"], _new_stage())
+    stage["calls"] += 1
+    stage["time"] += time.perf_counter() - frame["time"]
+    stage["peak_bytes"] = max(stage["peak_bytes"],
+                              frame["peak"] - frame["start"])
+    stage["allocated_bytes"] += current - frame["start"]
+    if frame["snapshot"] is not None:
+        diff = _take_snapshot().compare_to(frame["snapshot"], "lineno")
+        for stat in diff[:_profile["top_sites"]]:
+            frame_info = stat.traceback[0]
+            site = "%s:%d" % (frame_info.filename, frame_info.lineno)
+            size, count = stage["sites"].get(site, (0, 0))
+            stage["sites"][site] = (size + stat.size_diff,
+                                    count + stat.count_diff)
+    if stack:
+        stack[-1]["peak"] = max(stack[-1]["peak"], frame["peak"])
+    _reset_peak()
+
+
+def _wrap_stage(name, func):
+    """Wrap a function to be accounted as a stage."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _profile is None:
+            return func(*args, **kwargs)
+        _enter(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _exit()
+    return wrapper
+
+
+def start(modules=(), max_depth=DEFAULT_MAX_DEPTH,
+          top_sites=DEFAULT_TOP_SITES):
+    """Start profiling, with ``draw_*`` functions of modules as stages."""
+    global _profile
+    if _profile is not None:
+        raise RuntimeError("Profiling is already started.")
+    patched = []
+    for module in modules:
+        for attr, func in list(vars(module).items()):
+            if (attr.startswith(STAGE_PREFIX) and callable(func)
+                    and getattr(func, "__module__", None) == module.__name__):
+                name = "%s.%s" % (module.__name__, attr)
+                setattr(module, attr, _wrap_stage(name, func))
+                patched.append((module, attr, func))
+    _profile = {
+        "stages": {},
+        "stack": [],
+        "surfaces": [],
+        "live_surfaces": {},
+        "surface_bytes": 0,
+        "surface_peak_bytes": 0,
+        "patched": patched,
+        "max_depth": max_depth,
+        "top_sites": top_sites,
+        "filters": _make_filters(),
+        "peak": 0,
+        "time": time.perf_counter(),
+    }
+    tracemalloc.start()
+
+
+def stop():
+    """Stop profiling, return a report as a JSON-friendly dict."""
+    global _profile
+    if _profile is None:
+        raise RuntimeError("Profiling is not started.")
+    _reset_peak()
+    tracemalloc.stop()
+    for module, attr, func in _profile["patched"]:
+        setattr(module, attr, func)
+    profile, _profile = _profile, None
+    stages = []
+    for name, stage in profile["stages"].items():
+        sites = sorted(stage.pop("sites").items(),
+                       key=lambda site: -abs(site[1][0]))
+        stage["top_sites"] = [
+            {"site": site, "size_bytes": size, "count": count}
+            for site, (size, count) in sites[:profile["top_sites"]]
+        ]
+        stages.append(dict(name=name, **stage))
+    return {
+        "time": time.perf_counter() - profile["time"],
+        "peak_bytes": profile["peak"],
+        "surface_peak_bytes": profile["surface_peak_bytes"],
+        "surface_total_bytes": sum(s["bytes"] for s in profile["surfaces"]),
+        "stages": stages,
+        "surfaces": profile["surfaces"],
+    }
+
+
+def account_surface(surface, label):
+    """Account an allocated image surface, if profiling is active."""
+    if _profile is None:
+        return
+    stack = _profile["stack"]
+    size = surface.get_stride() * surface.get_height()
+    _profile["surfaces"].append({
+        "label": label,
+        "stage": stack[-1]["name"] if stack else None,
+        "width": surface.get_width(),
+        "height": surface.get_height(),
+        "bytes": size,
+    })
+    _profile["live_surfaces"][id(surface)] = size
+    _profile["surface_bytes"] += size
+    _profile["surface_peak_bytes"] = max(_profile["surface_peak_bytes"],
+                                         _profile["surface_bytes"])
+
+
+def release_surface(surface):
+    """Account an image surface as freed, if profiling is active."""
+    if _profile is None:
+        return
+    size = _profile["live_surfaces"].pop(id(surface), 0)
+    _profile["surface_bytes"] -= size
+
+
+def write_report(report, filename):
+    """Write profiling report to a JSON file."""
+    with open(filename, "w") as report_file:
+        json.dump(report, report_file, indent=2)
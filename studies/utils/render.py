@@ -0,0 +1,159 @@
+"""A collection of helpers for rendering studies."""
+import math
+
+import cairo
+
+from utils.scene import Scene
+from utils.patterns import linear_gradient
+from utils.profiling import account_surface, release_surface
+
+DEFAULT_BAND_HEIGHT = 256
+
+
+def offscreen_like(ctx, extents=None):
+    """Make an offscreen surface and context matching the target of ``ctx``.
+
+    With ``(x1, y1, x2, y2)`` user space ``extents``, the surface only
+    covers their bounding box on the target.
+
+    """
+    if isinstance(ctx, Scene):
+        layer = ctx.new_layer()
+        return layer, layer
+    target = ctx.get_target()
+    x1, y1, x2, y2 = 0, 0, target.get_width(), target.get_height()
+    if extents is not None:
+        ux1, uy1, ux2, uy2 = extents
+        corners = [ctx.user_to_device(x, y)
+                   for x in (ux1, ux2) for y in (uy1, uy2)]
+        x1 = max(x1, math.floor(min(x for x, _ in corners)))
+        y1 = max(y1, math.floor(min(y for _, y in corners)))
+        x2 = min(x2, math.ceil(max(x for x, _ in corners)))
+        y2 = min(y2, math.ceil(max(y for _, y in corners)))
+    surface = target.create_similar(cairo.CONTENT_COLOR_ALPHA,
+                                    max(1, x2 - x1), max(1, y2 - y1))
+    surface.set_device_offset(-x1, -y1)
+    account_surface(surface, "offscreen")
+    offscreen_ctx = cairo.Context(surface)
+    offscreen_ctx.set_matrix(ctx.get_matrix())
+    return surface, offscreen_ctx
+
+
+def has_pixels(ctx):
+    """Check if ``ctx`` draws to an image surface, to filter its pixels."""
+    if isinstance(ctx, Scene):
+        return False
+    return isinstance(ctx.get_group_target(), cairo.ImageSurface)
+
+
+def blit(ctx, surface):
+    """Paint offscreen surface over the target of ``ctx``, pixel to pixel.
+
+    The offscreen surface is finished after that, to free its memory.
+
+    """
+    if isinstance(ctx, Scene):
+        ctx.draw_layer(surface)
+        return
+    ctx.save()
+    ctx.identity_matrix()
+    ctx.set_source_surface(surface)
+    ctx.paint()
+    ctx.restore()
+    surface.finish()
+    release_surface(surface)
+
+
+def fill_faded(ctx, x, y, width, height, stops_x, stops_y):
+    """Fill a rectangle with a horizontal gradient, faded vertically.
+
+    ``stops_x`` are ``(offset, rgba)`` color stops along the rectangle
+    width, and alpha of ``stops_y`` fades them along its height. On an
+    image surface, the gradient is composed right on its pixels with
+    NumPy, without an offscreen surface.
+
+    """
+    if isinstance(ctx, Scene):
+        ctx.fill_faded(x, y, width, height, stops_x, stops_y)
+        return
+    _, yx, xy, _, _, _ = tuple(ctx.get_matrix())
+    if not has_pixels(ctx) or yx or xy:
+        # otherwise, fade the gradient on a separate group
+        ctx.save()
+        ctx.push_group()
+        ctx.rectangle(x, y, width, height)
+        ctx.set_operator(cairo.Operator.SOURCE)
+        ctx.set_source(linear_gradient(x, y, x + width, y, stops_x))
+        ctx.fill_preserve()
+        ctx.set_operator(cairo.Operator.DEST_IN)
+        ctx.set_source(linear_gradient(x, y, x, y + height, stops_y))
+        ctx.fill()
+        ctx.pop_group_to_source()
+        ctx.paint()
+        ctx.restore()
+        return
+    # numpy is only needed here, so filters are imported lazily
+    from utils.filters import surface_pixels, linear_ramp, over
+    surface = ctx.get_group_target()
+    offset_x, offset_y = surface.get_device_offset()
+    x1, y1 = ctx.user_to_device(x, y)
+    x2, y2 = ctx.user_to_device(x + width, y + height)
+    x1, x2 = x1 + offset_x, x2 + offset_x
+    y1, y2 = y1 + offset_y, y2 + offset_y
+    with surface_pixels(surface) as pixels:
+        rows, columns = pixels.shape[:2]
+        left, right = max(0, round(x1)), min(columns, round(x2))
+        top, bottom = max(0, round(y1)), min(rows, round(y2))
+        if left >= right or top >= bottom:
+            return
+        colors = linear_ramp(columns, x1, x2, stops_x)[None, left:right]
+        fade = linear_ramp(rows, y1, y2, stops_y)[top:bottom, 3:]
+        over(pixels[top:bottom, left:right], colors, fade)
+
+
+def output_size(design_size, width=None, height=None):
+    """Complete output size, deriving a missing side from design aspect."""
+    design_width, design_height = design_size
+    if width and height:
+        return width, height
+    if width:
+        return width, max(1, round(width * design_height / design_width))
+    if height:
+        return max(1, round(height * design_width / design_height)), height
+    return design_width, design_height
+
+
+def render_bands(draw, width, height, design_size,
+                 band_height=DEFAULT_BAND_HEIGHT, post=None):
+    """Render an image by horizontal bands, yielding ``(y, rgba)`` pairs.
+
+    The whole scene is drawn for every band, so ``draw(ctx)`` should
+    reset all its random state to produce the same picture each time.
+    Scene is drawn in its ``design_size`` coords, scaled uniformly to
+    cover the final ``width`` and ``height``, and centered, so with a
+    different aspect ratio it is cropped instead of stretched. Then
+    ``post(surface, y)`` is called for every band, if given, to
+    post-process its pixels.
+
+    """
+    if band_height < 1:
+        raise ValueError("Band height should be positive: %s" % band_height)
+    # numpy is only needed here, so output helpers are imported lazily
+    from utils.output import surface_to_rgba
+    design_width, design_height = design_size
+    scale = max(width / design_width, height / design_height)
+    dx = (width - design_width * scale) / 2
+    dy = (height - design_height * scale) / 2
+    for y in range(0, height, band_height):
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width,
+                                     min(band_height, height - y))
+        account_surface(surface, "band")
+        ctx = cairo.Context(surface)
+        ctx.translate(dx, dy - y)
+        ctx.scale(scale, scale)
+        draw(ctx)
+        if post is not None:
+            post(surface, y)
+        yield y, surface_to_rgba(surface)
+        surface.finish()
+        release_surface(surface)
@@ -0,0 +1,256 @@
+"""A scene representation, recorded from drawing calls and replayed later.
+
+``Scene`` mimics a subset of ``cairo.Context`` API used by studies, so
+any drawing code could record to it instead of a raster surface. The
+recorded scene is just nested tuples of numbers, so it is cheap to
+store on disk (as zlib-compressed JSON) and to replay with raster or
+vector backends.
+
+"""
+import json
+import os
+import zlib
+
+import cairo
+
+from utils.patterns import linear_gradient, radial_gradient
+
+SCENE_VERSION = 2
+
+
+def _pattern_spec(pattern):
+    """Convert cairo pattern to a plain tuple."""
+    if isinstance(pattern, cairo.SolidPattern):
+        return ("rgba", pattern.get_rgba())
+    # matrix is a sequence of its ``xx, yx, xy, yy, x0, y0`` components
+    matrix = tuple(pattern.get_matrix())
+    stops = tuple(pattern.get_color_stops_rgba())
+    if isinstance(pattern, cairo.LinearGradient):
+        return ("linear", pattern.get_linear_points(), stops, matrix)
+    if isinstance(pattern, cairo.RadialGradient):
+        return ("radial", pattern.get_radial_circles(), stops, matrix)
+    raise ValueError("Unsupported pattern: %s" % type(pattern).__name__)
+
+
+def _make_pattern(spec):
+    """Convert a plain tuple back to cairo pattern.
+
+    Gradients are taken from ``utils.patterns`` cache, so the recorded
+    matrix is followed by the translation of a cached gradient.
+
+    """
+    kind = spec[0]
+    if kind == "rgba":
+        return cairo.SolidPattern(*spec[1])
+    _, params, stops, matrix = spec
+    stops = [(stop[0], stop[1:]) for stop in stops]
+    if kind == "linear":
+        pattern = linear_gradient(*params, stops)
+    else:
+        pattern = radial_gradient(*params, stops)
+    pattern.set_matrix(cairo.Matrix(*matrix).multiply(pattern.get_matrix()))
+    return pattern
+
+
+def _color_stops(stops):
+    """Convert ``(offset, rgba)`` color stops to plain tuples."""
+    return tuple((float(offset), tuple(float(c) for c in color))
+                 for offset, color in stops)
+
+
+def _as_tuples(data):
+    """Convert nested lists, as loaded from JSON, back to tuples."""
+    if isinstance(data, list):
+        return tuple(_as_tuples(item) for item in data)
+    return data
+
+
+def _draw_segments(ctx, segments):
+    """Draw a recorded path."""
+    for segment in segments:
+        kind, args = segment[0], segment[1:]
+        if kind == "M":
+            ctx.move_to(*args)
+        elif kind == "L":
+            ctx.line_to(*args)
+        elif kind == "A":
+            ctx.arc(*args)
+        elif kind == "R":
+            ctx.rectangle(*args)
+        else:
+            ctx.close_path()
+
+
+def replay(ops, ctx):
+    """Replay recorded operations on cairo context."""
+    for op in ops:
+        kind = op[0]
+        if kind == "fill":
+            _draw_segments(ctx, op[1])
+            ctx.fill()
+        elif kind == "stroke":
+            _draw_segments(ctx, op[1])
+            ctx.stroke()
+        elif kind == "paint":
+            ctx.paint()
+        elif kind == "source":
+            ctx.set_source(_make_pattern(op[1]))
+        elif kind == "line_width":
+            ctx.set_line_width(op[1])
+        elif kind == "operator":
+            ctx.set_operator(cairo.Operator(op[1]))
+        elif kind == "save":
+            ctx.save()
+        elif kind == "restore":
+            ctx.restore()
+        elif kind == "faded":
+            # utils.render imports this module, so it is imported here
+            from utils.render import fill_faded
+            fill_faded(ctx, *op[1:])
+        elif kind == "layer":
+            # layer is composed separately, then painted over
+            ctx.push_group()
+            replay(op[1], ctx)
+            ctx.pop_group_to_source()
+            ctx.paint()
+        else:
+            raise ValueError("Unknown scene operation: %s" % kind)
+
+
+class Scene:
+    """Record drawing calls as a scene of polygons, patterns and layers."""
+
+    def __init__(self, width, height, scale=1):
+        """Start an empty scene of a given size.
+
+        ``scale`` is a number of device pixels per scene unit at the
+        intended output, used for adaptive tessellation only.
+
+        """
+        self.width, self.height = width, height
+        self.scale = scale
+        self.ops = []
+        self._path = []
+
+    def _flush_path(self):
+        """Take the current path, resetting it."""
+        path, self._path = tuple(self._path), []
+        return path
+
+    def move_to(self, x, y):
+        """Begin a new sub-path."""
+        self._path.append(("M", float(x), float(y)))
+
+    def line_to(self, x, y):
+        """Add a line to the path."""
+        self._path.append(("L", float(x), float(y)))
+
+    def arc(self, xc, yc, radius, angle1, angle2):
+        """Add a circular arc to the path."""
+        self._path.append(("A", float(xc), float(yc), float(radius),
+                           float(angle1), float(angle2)))
+
+    def rectangle(self, x, y, width, height):
+        """Add a closed rectangle sub-path."""
+        self._path.append(("R", float(x), float(y),
+                           float(width), float(height)))
+
+    def close_path(self):
+        """Close the current sub-path."""
+        self._path.append(("Z",))
+
+    def fill(self):
+        """Fill the current path."""
+        self.ops.append(("fill", self._flush_path()))
+
+    def stroke(self):
+        """Stroke the current path."""
+        self.ops.append(("stroke", self._flush_path()))
+
+    def paint(self):
+        """Paint the current source everywhere."""
+        self.ops.append(("paint",))
+
+    def fill_faded(self, x, y, width, height, stops_x, stops_y):
+        """Fill a rectangle with a horizontal gradient, faded vertically.
+
+        It is recorded as a single operation, to be composed right on
+        image pixels on replay.
+
+        """
+        self.ops.append(("faded", float(x), float(y), float(width),
+                         float(height), _color_stops(stops_x),
+                         _color_stops(stops_y)))
+
+    def set_source(self, pattern):
+        """Set a cairo pattern as a source."""
+        self.ops.append(("source", _pattern_spec(pattern)))
+
+    def set_source_rgba(self, r, g, b, a=1):
+        """Set a solid color as a source."""
+        rgba = tuple(float(c) for c in (r, g, b, a))
+        self.ops.append(("source", ("rgba", rgba)))
+
+    def set_line_width(self, width):
+        """Set line width for strokes."""
+        self.ops.append(("line_width", float(width)))
+
+    def set_operator(self, operator):
+        """Set compositing operator."""
+        self.ops.append(("operator", int(operator)))
+
+    def save(self):
+        """Save drawing state."""
+        self.ops.append(("save",))
+
+    def restore(self):
+        """Restore drawing state."""
+        self.ops.append(("restore",))
+
+    def device_to_user_distance(self, dx, dy):
+        """Convert a distance in output pixels to scene units."""
+        return dx / self.scale, dy / self.scale
+
+    def new_layer(self):
+        """Make an empty layer of the same size, to draw offscreen."""
+        return Scene(self.width, self.height, self.scale)
+
+    def draw_layer(self, layer):
+        """Paint the layer over the scene."""
+        self.ops.append(("layer", tuple(layer.ops)))
+
+    def replay(self, ctx):
+        """Draw the scene on cairo context."""
+        replay(self.ops, ctx)
+
+    def export(self, filename):
+        """Export the scene to a vector ``.svg`` or ``.pdf`` file."""
+        ext = os.path.splitext(filename)[1].lower()
+        if ext == ".svg":
+            surface = cairo.SVGSurface(filename, self.width, self.height)
+        elif ext == ".pdf":
+            surface = cairo.PDFSurface(filename, self.width, self.height)
+        else:
+            raise ValueError("Unsupported vector format: %s" % ext)
+        self.replay(cairo.Context(surface))
+        surface.finish()
+
+    def save_to(self, filename):
+        """Store the scene to a compressed file."""
+        data = (SCENE_VERSION, self.width, self.height, self.scale,
+                self.ops)
+        data = json.dumps(data, separators=(",", ":")).encode()
+        with open(filename, "wb") as scene_file:
+            scene_file.write(zlib.compress(data))
+
+    @classmethod
+    def load(cls, filename):
+        """Load the scene, previously stored with ``save_to``."""
+        with open(filename, "rb") as scene_file:
+            data = json.loads(zlib.decompress(scene_file.read()))
+        version, width, height, scale, ops = data
+        if version != SCENE_VERSION:
+            raise ValueError("Unsupported scene version: %s" % version)
+        scene = cls(width, height, scale)
+        scene.ops = list(_as_tuples(ops))
+        return scene
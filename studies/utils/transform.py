@@ -2,8 +2,6 @@
 
 import math
 
-import numpy as np
-
 
 def polar2vec(r, phi):
     """Calculate Cartesian vector from polar coords."""
@@ -29,6 +27,8 @@ def line_plane_collision(plane_normal, plane_point,
 def perspective_point(x, y, phi, focal_length=1, dz=0, dx=0):
     """Calculate simple perspective for a point."""
     # TODO: use Z coordinate for original point
+    # numpy is imported lazily, to keep utils import light
+    import numpy as np
     plane_normal = np.asarray([0, 0, 1], dtype=np.float64)
     plane_point = np.asarray([0, 0, 0], dtype=np.float64)
     focal_point = np.asarray([0, 0, focal_length],